@@ -0,0 +1,19 @@
+#!/bin/sh
+# Production boot: apply the committed migrations, then start gunicorn with
+# the app preloaded and warmed in the master (see gunicorn.conf.py).
+set -e
+
+# Start with an empty Prometheus multiprocess directory. This has to happen
+# before the first Django import: metrics open their files at import time.
+if [ -n "$PROMETHEUS_MULTIPROC_DIR" ]; then
+    rm -rf "$PROMETHEUS_MULTIPROC_DIR"
+    mkdir -p "$PROMETHEUS_MULTIPROC_DIR"
+fi
+
+python manage.py migrate --noinput
+
+if [ -n "$DJANGO_SUPERUSER_USERNAME" ]; then
+    python manage.py createsuperuser --noinput || true
+fi
+
+exec gunicorn snipbox.wsgi:application --preload
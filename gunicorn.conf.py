@@ -0,0 +1,59 @@
+"""
+Gunicorn configuration for SnipBox.
+
+Picked up automatically when gunicorn is started from the project root.
+With ``--preload`` (the production boot, see ``boot.sh``) the app is
+imported and warmed once in the master and shared with the forked
+workers; otherwise each worker warms itself before taking traffic.
+"""
+import os
+import shutil
+
+bind = os.environ.get('GUNICORN_BIND', '0.0.0.0:8000')
+workers = int(os.environ.get('GUNICORN_WORKERS', '3'))
+# Threaded workers: each one runs up to ``threads`` requests at once, and
+# ConcurrencyLimitMiddleware (SNIPBOX_ADMISSION['MAX_IN_FLIGHT'], kept
+# below this) uses the spare threads to turn away overflow with a 503.
+worker_class = 'gthread'
+threads = int(os.environ.get('GUNICORN_THREADS', '8'))
+
+
+def on_starting(server):
+    """Start every boot with an empty Prometheus multiprocess directory.
+
+    With ``--preload`` the app, and with it the metric files, is already
+    loaded when this hook runs, so the directory is left alone; ``boot.sh``
+    clears it before anything imports Django.
+    """
+    path = os.environ.get('PROMETHEUS_MULTIPROC_DIR')
+    if path and not server.cfg.preload_app:
+        shutil.rmtree(path, ignore_errors=True)
+        os.makedirs(path, exist_ok=True)
+
+
+def when_ready(server):
+    """Warm the preloaded app in the master, before any worker forks."""
+    if server.cfg.preload_app:
+        from snipbox.warmup import warmup
+        warmup()
+
+
+def post_fork(server, worker):
+    """Never reuse a DB connection inherited from the master."""
+    if server.cfg.preload_app:
+        from django.db import connections
+        connections.close_all()
+
+
+def post_worker_init(worker):
+    """Without preloading, warm each worker after it has loaded the app."""
+    if not worker.cfg.preload_app:
+        from snipbox.warmup import warmup
+        warmup()
+
+
+def child_exit(server, worker):
+    """Drop the live gauges of a worker that has exited."""
+    if os.environ.get('PROMETHEUS_MULTIPROC_DIR'):
+        from prometheus_client import multiprocess
+        multiprocess.mark_process_dead(worker.pid)
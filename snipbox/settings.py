@@ -10,6 +10,8 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/6.0/ref/settings/
 """
 
+import os
+import tempfile
 from datetime import timedelta
 from pathlib import Path
 
@@ -46,6 +48,8 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    "snippets.metrics.MetricsMiddleware",
+    "snippets.throttling.ConcurrencyLimitMiddleware",
     "django.middleware.security.SecurityMiddleware",
     "django.contrib.sessions.middleware.SessionMiddleware",
     "django.middleware.common.CommonMiddleware",
@@ -125,6 +129,17 @@ STATIC_URL = "static/"
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
 
+# Throttling
+# Token buckets live in a local SQLite file so every gunicorn worker shares them.
+SNIPBOX_THROTTLE = {
+    'PATH': Path(tempfile.gettempdir()) / 'snipbox-throttle.sqlite3',
+}
+
+
+# Tests get a throwaway throttle store (see snipbox/test_runner.py)
+TEST_RUNNER = 'snipbox.test_runner.SnipboxTestRunner'
+
+
 # Django REST Framework
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': (
@@ -133,6 +148,27 @@ REST_FRAMEWORK = {
     'DEFAULT_PERMISSION_CLASSES': (
         'rest_framework.permissions.IsAuthenticated',
     ),
+    # Token buckets: '<capacity>/<period>', refilled evenly over the period.
+    'DEFAULT_THROTTLE_CLASSES': (
+        'snippets.throttling.UserTokenBucketThrottle',
+        'snippets.throttling.EndpointTokenBucketThrottle',
+    ),
+    # Override with SNIPBOX_THROTTLE_<SCOPE>; an empty value disables that scope
+    # (e.g. for `manage.py loadtest` capacity runs).
+    'DEFAULT_THROTTLE_RATES': {
+        'user': os.environ.get('SNIPBOX_THROTTLE_USER', '1200/min'),
+        'snippets': os.environ.get('SNIPBOX_THROTTLE_SNIPPETS', '600/min'),
+        'tags': os.environ.get('SNIPBOX_THROTTLE_TAGS', '600/min'),
+    },
+}
+
+
+# Admission control: requests beyond MAX_IN_FLIGHT per worker get a 503.
+# Keep it below the gunicorn thread count (GUNICORN_THREADS, see gunicorn.conf.py)
+# so a saturated worker still has threads free to reject requests quickly.
+SNIPBOX_ADMISSION = {
+    'MAX_IN_FLIGHT': int(os.environ.get('SNIPBOX_MAX_IN_FLIGHT', '6')),
+    'RETRY_AFTER': 1,
 }
 
 
@@ -146,5 +182,15 @@ SIMPLE_JWT = {
 }
 
 
+# Background tasks (see snippets/tasks.py)
+SNIPBOX_TASKS = {
+    'BACKEND': 'thread',  # 'thread', 'sqlite' (drained by `manage.py run_worker`) or 'eager'
+    'WORKERS': 2,
+    'MAX_RETRIES': 3,
+    'RETRY_DELAY': 1.0,
+    'SQLITE_PATH': BASE_DIR / 'tasks.sqlite3',
+}
+
+
 # CORS
 CORS_ALLOW_ALL_ORIGINS = True
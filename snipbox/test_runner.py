@@ -0,0 +1,28 @@
+"""
+Test runner for SnipBox.
+
+Points the throttle bucket store at a temporary file for the whole run,
+so tests neither see nor leave behind the buckets of a local server.
+"""
+import tempfile
+from pathlib import Path
+
+from django.conf import settings
+from django.test.runner import DiscoverRunner
+
+
+class SnipboxTestRunner(DiscoverRunner):
+
+    def setup_test_environment(self, **kwargs):
+        super().setup_test_environment(**kwargs)
+        self._throttle_dir = tempfile.TemporaryDirectory()
+        self._saved_throttle = settings.SNIPBOX_THROTTLE
+        settings.SNIPBOX_THROTTLE = {
+            **settings.SNIPBOX_THROTTLE,
+            'PATH': Path(self._throttle_dir.name) / 'throttle.sqlite3',
+        }
+
+    def teardown_test_environment(self, **kwargs):
+        settings.SNIPBOX_THROTTLE = self._saved_throttle
+        self._throttle_dir.cleanup()
+        super().teardown_test_environment(**kwargs)
@@ -22,9 +22,12 @@ from rest_framework_simplejwt.views import (
     TokenRefreshView,
 )
 
+from snippets.metrics import metrics_view
+
 urlpatterns = [
     path("admin/", admin.site.urls),
     path('api/v1/token/', TokenObtainPairView.as_view(), name='token_obtain_pair'),
     path('api/v1/token/refresh/', TokenRefreshView.as_view(), name='token_refresh'),
     path('api/v1/', include('snippets.urls')),
+    path('metrics', metrics_view, name='metrics'),
 ]
@@ -0,0 +1,93 @@
+"""
+Set-based tag maintenance: orphan garbage collection and tag merging.
+
+Both operations run as a handful of SQL statements regardless of how many
+snippets are involved. They work on the tables directly, so the model
+``post_delete`` signals for the removed ``Tag`` rows are not sent.
+"""
+from django.db import IntegrityError, connection, transaction
+
+from .models import Snippet, Tag, UserTagCount
+from .stats import rebuild_tag_counts
+from .tasks import dispatch
+
+TAG_TABLE = Tag._meta.db_table
+LINK_TABLE = Snippet.tags.through._meta.db_table
+TAG_COUNT_TABLE = UserTagCount._meta.db_table
+
+
+def collect_orphan_tags(batch_size=1000):
+    """Delete tags linked to no snippet, ``batch_size`` rows per statement.
+
+    Returns the number of tags deleted.
+    """
+    sql = (
+        f'DELETE FROM {TAG_TABLE} WHERE id IN ('
+        f'SELECT t.id FROM {TAG_TABLE} t WHERE NOT EXISTS ('
+        f'SELECT 1 FROM {LINK_TABLE} l WHERE l.tag_id = t.id'
+        f') ORDER BY t.id LIMIT %s)'
+    )
+    with connection.cursor() as cursor:
+        # Stale rollup rows would otherwise block deleting their tag.
+        cursor.execute(
+            f'DELETE FROM {TAG_COUNT_TABLE} WHERE NOT EXISTS ('
+            f'SELECT 1 FROM {LINK_TABLE} l WHERE l.tag_id = {TAG_COUNT_TABLE}.tag_id)'
+        )
+    deleted = 0
+    while True:
+        with transaction.atomic(), connection.cursor() as cursor:
+            cursor.execute(sql, [batch_size])
+            count = cursor.rowcount
+        deleted += count
+        if count < batch_size:
+            return deleted
+
+
+def count_orphan_tags():
+    """Number of tags that ``collect_orphan_tags`` would delete."""
+    return Tag.objects.filter(snippets__isnull=True).count()
+
+
+def merge_tags(source, target):
+    """Move every link from ``source`` to ``target`` and delete ``source``.
+
+    Snippets already tagged with both keep a single link. Returns the
+    number of links that were repointed.
+    """
+    if source.pk == target.pk:
+        return 0
+    with transaction.atomic(), connection.cursor() as cursor:
+        cursor.execute(
+            f'UPDATE {LINK_TABLE} SET tag_id = %s '
+            f'WHERE tag_id = %s AND snippet_id NOT IN ('
+            f'SELECT snippet_id FROM {LINK_TABLE} WHERE tag_id = %s)',
+            [target.pk, source.pk, target.pk],
+        )
+        moved = cursor.rowcount
+        cursor.execute(f'DELETE FROM {LINK_TABLE} WHERE tag_id = %s', [source.pk])
+        rebuild_tag_counts([source.pk, target.pk])
+        cursor.execute(f'DELETE FROM {TAG_TABLE} WHERE id = %s', [source.pk])
+        dispatch('tags_merged', source_id=source.pk, target_id=target.pk)
+    return moved
+
+
+def rename_tag(tag, title):
+    """Rename ``tag``, merging it into an existing tag with that title.
+
+    Returns the tag that now carries ``title``.
+    """
+    title = title.strip()
+    # Rename first and merge on a unique conflict, so a tag with that title
+    # created concurrently (e.g. by a snippet write) is merged into rather
+    # than failing the rename. Starting with the write also takes SQLite's
+    # write lock up front.
+    with transaction.atomic():
+        try:
+            with transaction.atomic():
+                Tag.objects.filter(pk=tag.pk).update(title=title)
+        except IntegrityError:
+            existing = Tag.objects.get(title=title)
+            merge_tags(tag, existing)
+            return existing
+    tag.title = title
+    return tag
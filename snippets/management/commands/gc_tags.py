@@ -0,0 +1,38 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from snippets.maintenance import collect_orphan_tags, count_orphan_tags
+
+
+class Command(BaseCommand):
+    help = 'Delete tags that are no longer linked to any snippet.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=1000,
+            help='Maximum number of tags to delete per statement (default: 1000).',
+        )
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Only report how many tags would be deleted.',
+        )
+        parser.add_argument(
+            '--interval',
+            type=float,
+            help='Keep running, collecting every INTERVAL seconds.',
+        )
+
+    def handle(self, *args, **options):
+        while True:
+            if options['dry_run']:
+                self.stdout.write(f'{count_orphan_tags()} orphaned tag(s) would be deleted.')
+            else:
+                deleted = collect_orphan_tags(options['batch_size'])
+                self.stdout.write(f'Deleted {deleted} orphaned tag(s).')
+            if not options['interval']:
+                return
+            time.sleep(options['interval'])
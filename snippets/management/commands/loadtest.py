@@ -0,0 +1,424 @@
+import asyncio
+import json
+import math
+import random
+import time
+from collections import Counter
+from urllib.parse import urlsplit
+
+from django.core.management.base import BaseCommand, CommandError
+
+# Retries per snippet while cleanup is throttled (1 s apart).
+CLEANUP_ATTEMPTS = 30
+
+DEFAULT_MIX = 'overview=40,detail=25,create=10,update=10,delete=5,tags=10'
+
+
+def parse_mix(value):
+    """Parse ``name=weight,...`` into a {name: weight} dict of known operations."""
+    mix = {}
+    for part in value.split(','):
+        name, _, weight = part.partition('=')
+        name = name.strip()
+        if name not in OPERATIONS:
+            raise CommandError(f'Unknown operation "{name}". Choose from: {", ".join(OPERATIONS)}.')
+        try:
+            mix[name] = float(weight)
+        except ValueError:
+            raise CommandError(f'Weight for "{name}" must be a number.')
+    if not any(mix.values()):
+        raise CommandError('At least one operation needs a positive weight.')
+    return mix
+
+
+def percentile(sorted_values, pct):
+    """Nearest-rank percentile of an already sorted list."""
+    if not sorted_values:
+        return 0.0
+    index = max(0, min(len(sorted_values) - 1, math.ceil(pct / 100 * len(sorted_values)) - 1))
+    return sorted_values[index]
+
+
+class HTTPClient:
+    """Minimal keep-alive HTTP/1.1 JSON client over asyncio streams."""
+
+    def __init__(self, host, port):
+        self.host = host
+        self.port = port
+        self.reader = None
+        self.writer = None
+
+    async def close(self):
+        if self.writer is not None:
+            self.writer.close()
+            try:
+                await self.writer.wait_closed()
+            except ConnectionError:
+                pass
+        self.reader = self.writer = None
+
+    async def request(self, method, path, token=None, payload=None):
+        """Send one request and return ``(status, decoded JSON or None)``."""
+        body = json.dumps(payload).encode() if payload is not None else b''
+        lines = [
+            f'{method} {path} HTTP/1.1',
+            f'Host: {self.host}:{self.port}',
+            'Accept: application/json',
+            f'Content-Length: {len(body)}',
+        ]
+        if payload is not None:
+            lines.append('Content-Type: application/json')
+        if token:
+            lines.append(f'Authorization: Bearer {token}')
+        data = ('\r\n'.join(lines) + '\r\n\r\n').encode() + body
+
+        for attempt in range(2):
+            reused = self.writer is not None
+            if not reused:
+                self.reader, self.writer = await asyncio.open_connection(self.host, self.port)
+            try:
+                self.writer.write(data)
+                await self.writer.drain()
+                return await self._read_response()
+            except (ConnectionError, asyncio.IncompleteReadError):
+                await self.close()
+                # A kept-alive connection may have been closed by the server.
+                if not reused or attempt:
+                    raise
+
+    async def _read_response(self):
+        status_line = await self.reader.readline()
+        if not status_line:
+            raise ConnectionError('Server closed the connection.')
+        status = int(status_line.split()[1])
+        headers = {}
+        while True:
+            line = await self.reader.readline()
+            if line in (b'\r\n', b'\n', b''):
+                break
+            name, _, value = line.decode('latin-1').partition(':')
+            headers[name.strip().lower()] = value.strip()
+
+        if headers.get('transfer-encoding', '').lower() == 'chunked':
+            body = await self._read_chunked()
+        elif 'content-length' in headers:
+            body = await self.reader.readexactly(int(headers['content-length']))
+        else:
+            body = await self.reader.read()
+            headers['connection'] = 'close'
+        if headers.get('connection', '').lower() == 'close':
+            await self.close()
+
+        if body and headers.get('content-type', '').startswith('application/json'):
+            return status, json.loads(body)
+        return status, None
+
+    async def _read_chunked(self):
+        chunks = []
+        while True:
+            size = int((await self.reader.readline()).split(b';')[0], 16)
+            if not size:
+                await self.reader.readline()
+                return b''.join(chunks)
+            chunks.append(await self.reader.readexactly(size))
+            await self.reader.readline()
+
+
+class Session:
+    """One authenticated user and the snippets this run created for it.
+
+    Only these ids are updated or deleted, so a run never touches data
+    that existed before it started.
+    """
+
+    def __init__(self, token, tag_prefix):
+        self.token = token
+        self.tag_prefix = tag_prefix
+        self.ids = []
+        self.counter = 0
+
+    def pick(self, rng):
+        return rng.choice(self.ids) if self.ids else None
+
+
+# Each operation returns ``(name of the operation that ran, HTTP status)``:
+# those needing an existing snippet create one instead while the run has
+# none, and that request is reported under ``create``.
+
+
+async def op_overview(client, session, rng):
+    status, _ = await client.request('GET', '/api/v1/snippets/', session.token)
+    return 'overview', status
+
+
+async def op_detail(client, session, rng):
+    pk = session.pick(rng)
+    if pk is None:
+        return await op_create(client, session, rng)
+    status, _ = await client.request('GET', f'/api/v1/snippets/{pk}/', session.token)
+    return 'detail', status
+
+
+async def op_create(client, session, rng):
+    session.counter += 1
+    status, data = await client.request('POST', '/api/v1/snippets/', session.token, {
+        'title': f'loadtest {session.counter}',
+        'note': 'x' * rng.randint(20, 400),
+        'tags': [{'title': f'{session.tag_prefix}{session.counter}'}],
+    })
+    if status == 201 and data:
+        session.ids.append(data['id'])
+    return 'create', status
+
+
+async def op_update(client, session, rng):
+    pk = session.pick(rng)
+    if pk is None:
+        return await op_create(client, session, rng)
+    status, _ = await client.request('PATCH', f'/api/v1/snippets/{pk}/', session.token, {
+        'note': 'y' * rng.randint(20, 400),
+    })
+    return 'update', status
+
+
+async def op_delete(client, session, rng):
+    pk = session.pick(rng)
+    if pk is None:
+        return await op_create(client, session, rng)
+    # Claimed up front so no other client picks it meanwhile; handed back
+    # if the delete did not happen, so cleanup still removes it.
+    session.ids.remove(pk)
+    status = None
+    try:
+        status, _ = await client.request('DELETE', f'/api/v1/snippets/{pk}/', session.token)
+    finally:
+        if status not in (200, 404):
+            session.ids.append(pk)
+    return 'delete', status
+
+
+async def op_tags(client, session, rng):
+    status, _ = await client.request('GET', '/api/v1/tags/', session.token)
+    return 'tags', status
+
+
+OPERATIONS = {
+    'overview': op_overview,
+    'detail': op_detail,
+    'create': op_create,
+    'update': op_update,
+    'delete': op_delete,
+    'tags': op_tags,
+}
+
+
+class Command(BaseCommand):
+    help = (
+        'Replay a mix of API requests against a running SnipBox server at a '
+        'target rate and report throughput, latency percentiles and errors.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--url',
+            default='http://127.0.0.1:8000',
+            help='Base URL of the server under test (default: http://127.0.0.1:8000).',
+        )
+        parser.add_argument(
+            '--user',
+            action='append',
+            dest='users',
+            metavar='USERNAME:PASSWORD',
+            required=True,
+            help='Credentials used to obtain a JWT (repeatable). Use dedicated test accounts.',
+        )
+        parser.add_argument('--rate', type=float, default=50, help='Target requests per second (default: 50).')
+        parser.add_argument('--duration', type=float, default=30, help='Seconds to run (default: 30).')
+        parser.add_argument('--concurrency', type=int, default=10, help='Number of client connections (default: 10).')
+        parser.add_argument('--mix', default=DEFAULT_MIX, help=f'Operation weights (default: {DEFAULT_MIX}).')
+        parser.add_argument('--seed', type=int, help='Random seed for a reproducible request sequence.')
+        parser.add_argument('--json', action='store_true', help='Print the report as JSON.')
+        parser.add_argument(
+            '--keep-data',
+            action='store_true',
+            help='Leave the snippets and tags created by the run in place.',
+        )
+
+    def handle(self, *args, **options):
+        url = urlsplit(options['url'])
+        if url.scheme != 'http' or not url.hostname:
+            raise CommandError('--url must be a plain http:// URL of a local server.')
+        if options['rate'] <= 0 or options['duration'] <= 0 or options['concurrency'] <= 0:
+            raise CommandError('--rate, --duration and --concurrency must be positive.')
+        mix = parse_mix(options['mix'])
+        tag_prefix = f'loadtest-{random.getrandbits(32):08x}-'
+        report = asyncio.run(self._run(url.hostname, url.port or 80, options['users'], mix, tag_prefix, options))
+        if not options['keep_data']:
+            report['cleanup']['tags'] = self._delete_tags(tag_prefix)
+        if options['json']:
+            self.stdout.write(json.dumps(report, indent=2))
+        else:
+            self._print_report(report)
+
+    def _delete_tags(self, tag_prefix):
+        """Delete this run's tags once no snippet uses them any more.
+
+        The API has no tag deletion, so this goes through the local
+        database; against a server with another database, run ``gc_tags``
+        there instead.
+        """
+        from snippets.models import Tag
+
+        deleted, _ = Tag.objects.filter(title__startswith=tag_prefix, snippets__isnull=True).delete()
+        return deleted
+
+    async def _login(self, host, port, users, tag_prefix):
+        client = HTTPClient(host, port)
+        sessions = []
+        try:
+            for credentials in users:
+                username, _, password = credentials.partition(':')
+                status, data = await client.request('POST', '/api/v1/token/', payload={
+                    'username': username,
+                    'password': password,
+                })
+                if status != 200:
+                    raise CommandError(f'Could not obtain a token for "{username}" (HTTP {status}).')
+                sessions.append(Session(data['access'], tag_prefix))
+        except OSError as exc:
+            raise CommandError(f'Could not connect to {host}:{port}: {exc}')
+        finally:
+            await client.close()
+        return sessions
+
+    async def _cleanup(self, host, port, sessions):
+        """Delete the snippets the run created; return ``(deleted, failed)``."""
+        client = HTTPClient(host, port)
+        deleted = failed = 0
+        try:
+            for session in sessions:
+                for pk in session.ids:
+                    # Back off while the server throttles or sheds load.
+                    for _ in range(CLEANUP_ATTEMPTS):
+                        status, _ = await client.request('DELETE', f'/api/v1/snippets/{pk}/', session.token)
+                        if status not in (429, 503):
+                            break
+                        await asyncio.sleep(1)
+                    if status in (200, 404):
+                        deleted += 1
+                    else:
+                        failed += 1
+        except (OSError, asyncio.IncompleteReadError) as exc:
+            raise CommandError(f'Cleanup failed, some loadtest snippets were left behind: {exc}')
+        finally:
+            await client.close()
+        return deleted, failed
+
+    async def _run(self, host, port, users, mix, tag_prefix, options):
+        sessions = await self._login(host, port, users, tag_prefix)
+        rng = random.Random(options['seed'])
+        names, weights = list(mix), list(mix.values())
+        concurrency = options['concurrency']
+        # Unbounded, so arrivals are never dropped when every client is busy.
+        queue = asyncio.Queue()
+        # Keyed by every operation: fallbacks are reported under ``create``
+        # even when the mix does not include it.
+        latencies = {name: [] for name in OPERATIONS}
+        waits = []
+        errors = Counter()
+        statuses = {name: Counter() for name in OPERATIONS}
+        loop = asyncio.get_running_loop()
+
+        async def worker(index):
+            client = HTTPClient(host, port)
+            session = sessions[index % len(sessions)]
+            try:
+                while (item := await queue.get()) is not None:
+                    name, scheduled = item
+                    waits.append(loop.time() - scheduled)
+                    try:
+                        name, status = await OPERATIONS[name](client, session, rng)
+                    except (OSError, asyncio.IncompleteReadError, ValueError):
+                        status = None
+                        await client.close()
+                    # Measured from the scheduled send time, so time spent
+                    # waiting for a free client counts (no coordinated omission).
+                    latencies[name].append(loop.time() - scheduled)
+                    statuses[name][str(status)] += 1
+                    if status is None or status >= 400:
+                        errors[name] += 1
+            finally:
+                await client.close()
+
+        workers = [asyncio.create_task(worker(index)) for index in range(concurrency)]
+        started = loop.time()
+        next_at, end = started, started + options['duration']
+        interval = 1 / options['rate']
+        while next_at < end:
+            queue.put_nowait((rng.choices(names, weights)[0], next_at))
+            next_at += interval
+            await asyncio.sleep(max(0, next_at - loop.time()))
+        for _ in workers:
+            queue.put_nowait(None)
+        await asyncio.gather(*workers)
+        elapsed = loop.time() - started
+
+        endpoints = {}
+        for name in OPERATIONS:
+            values = sorted(latencies[name])
+            if not values:
+                continue
+            endpoints[name] = {
+                'requests': len(values),
+                'errors': errors[name],
+                'error_rate': errors[name] / len(values),
+                'throughput': len(values) / elapsed,
+                'p50_ms': percentile(values, 50) * 1000,
+                'p90_ms': percentile(values, 90) * 1000,
+                'p99_ms': percentile(values, 99) * 1000,
+                'max_ms': values[-1] * 1000,
+                'statuses': dict(statuses[name]),
+            }
+        waits.sort()
+        total = sum(endpoint['requests'] for endpoint in endpoints.values())
+        report = {
+            'elapsed_s': elapsed,
+            'requests': total,
+            'throughput': total / elapsed,
+            'errors': sum(errors.values()),
+            'wait_p99_ms': percentile(waits, 99) * 1000,
+            'wait_max_ms': (waits[-1] if waits else 0.0) * 1000,
+            'endpoints': endpoints,
+            'cleanup': {},
+        }
+        if not options['keep_data']:
+            deleted, failed = await self._cleanup(host, port, sessions)
+            report['cleanup'] = {'snippets': deleted, 'failed': failed}
+        return report
+
+    def _print_report(self, report):
+        header = f'{"endpoint":<10} {"reqs":>7} {"errors":>7} {"err%":>6} {"req/s":>8} ' \
+                 f'{"p50 ms":>8} {"p90 ms":>8} {"p99 ms":>8} {"max ms":>8}'
+        self.stdout.write(header)
+        self.stdout.write('-' * len(header))
+        for name, row in report['endpoints'].items():
+            self.stdout.write(
+                f'{name:<10} {row["requests"]:>7} {row["errors"]:>7} {row["error_rate"] * 100:>6.1f} '
+                f'{row["throughput"]:>8.1f} {row["p50_ms"]:>8.1f} {row["p90_ms"]:>8.1f} '
+                f'{row["p99_ms"]:>8.1f} {row["max_ms"]:>8.1f}'
+            )
+        self.stdout.write('-' * len(header))
+        self.stdout.write(
+            f'{report["requests"]} requests in {report["elapsed_s"]:.1f}s '
+            f'({report["throughput"]:.1f} req/s), {report["errors"]} errors.'
+        )
+        self.stdout.write(
+            f'Latencies include time waiting for a free client: '
+            f'p99 {report["wait_p99_ms"]:.1f} ms, max {report["wait_max_ms"]:.1f} ms.'
+        )
+        cleanup = report['cleanup']
+        if cleanup:
+            self.stdout.write(
+                f'Cleanup: deleted {cleanup["snippets"]} snippets and {cleanup["tags"]} tags'
+                + (f', {cleanup["failed"]} snippets could not be deleted.' if cleanup['failed'] else '.')
+            )
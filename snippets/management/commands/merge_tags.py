@@ -0,0 +1,28 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from snippets.maintenance import rename_tag
+from snippets.models import Tag
+
+
+class Command(BaseCommand):
+    help = (
+        'Rename a tag. If a tag with the new title already exists, every '
+        'snippet is moved onto it and the old tag is deleted.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('source', help='Title of the tag to rename or merge away.')
+        parser.add_argument('target', help='New title, or title of the tag to merge into.')
+
+    def handle(self, *args, **options):
+        try:
+            source = Tag.objects.get(title=options['source'].strip())
+        except Tag.DoesNotExist:
+            raise CommandError(f'Tag "{options["source"]}" does not exist.')
+        if not options['target'].strip():
+            raise CommandError('Target title cannot be blank.')
+        max_length = Tag._meta.get_field('title').max_length
+        if len(options['target'].strip()) > max_length:
+            raise CommandError(f'Target title cannot be longer than {max_length} characters.')
+        tag = rename_tag(source, options['target'])
+        self.stdout.write(f'Snippets tagged "{options["source"]}" are now tagged "{tag.title}" (id {tag.pk}).')
@@ -0,0 +1,26 @@
+from django.core.management.base import BaseCommand
+
+from snippets.stats import rebuild
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the per-user snippet statistics rollups from scratch.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--user',
+            type=int,
+            action='append',
+            dest='user_ids',
+            help='Only rebuild this user id (repeatable).',
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=1000,
+            help='Rows per INSERT (default: 1000).',
+        )
+
+    def handle(self, *args, **options):
+        rebuild(options['user_ids'], options['batch_size'])
+        self.stdout.write('Snippet stats rebuilt.')
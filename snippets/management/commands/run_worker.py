@@ -0,0 +1,40 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from snippets.tasks import SQLiteBackend, get_backend
+
+
+class Command(BaseCommand):
+    help = 'Drain the durable SQLite task queue.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--once',
+            action='store_true',
+            help='Process the tasks that are due now and exit.',
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=100,
+            help='Maximum number of tasks to run per poll (default: 100).',
+        )
+        parser.add_argument(
+            '--poll-interval',
+            type=float,
+            default=1.0,
+            help='Seconds to sleep when the queue is empty (default: 1.0).',
+        )
+
+    def handle(self, *args, **options):
+        backend = get_backend(SQLiteBackend.name)
+        self.stdout.write(f'Draining task queue at {backend.path}')
+        while True:
+            processed = backend.drain(options['batch_size'])
+            if processed:
+                self.stdout.write(f'Processed {processed} task(s); {backend.depth()} pending.')
+            if options['once'] and processed < options['batch_size']:
+                return
+            if not processed:
+                time.sleep(options['poll_interval'])
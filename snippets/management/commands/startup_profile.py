@@ -0,0 +1,86 @@
+import json
+import os
+import subprocess
+import sys
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+CHILD_SCRIPT = (
+    'import json, sys\n'
+    'from snipbox.warmup import profile_startup\n'
+    'print(json.dumps(profile_startup(sys.argv[1] == "1", sys.argv[2])))\n'
+)
+
+
+class Command(BaseCommand):
+    help = (
+        'Start the app in fresh interpreters and report import time, warmup '
+        'time and time to first request, with and without warmup.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--repeat', type=int, default=3, help='Cold starts per mode (default: 3).')
+        parser.add_argument('--path', default='/api/v1/snippets/', help='Path of the first request.')
+        parser.add_argument('--top', type=int, default=10, help='Show the N slowest imports (default: 10, 0 to skip).')
+        parser.add_argument('--json', action='store_true', help='Print the report as JSON.')
+
+    def _run_child(self, run_warmup, path, importtime=False):
+        env = {**os.environ, 'DJANGO_SETTINGS_MODULE': os.environ.get('DJANGO_SETTINGS_MODULE', 'snipbox.settings')}
+        # Keep profiling runs out of the live server's metrics.
+        env.pop('PROMETHEUS_MULTIPROC_DIR', None)
+        command = [sys.executable]
+        if importtime:
+            command += ['-X', 'importtime']
+        command += ['-c', CHILD_SCRIPT, '1' if run_warmup else '0', path]
+        start = time.perf_counter()
+        result = subprocess.run(command, cwd=settings.BASE_DIR, env=env, capture_output=True, text=True)
+        elapsed = (time.perf_counter() - start) * 1000
+        if result.returncode:
+            raise CommandError(f'Profiling run failed:\n{result.stderr}')
+        timings = json.loads(result.stdout.strip().splitlines()[-1])
+        timings['process_ms'] = elapsed
+        return timings, result.stderr
+
+    def _slowest_imports(self, stderr, top):
+        """Parse ``-X importtime`` output into the ``top`` largest self times."""
+        imports = []
+        for line in stderr.splitlines():
+            if not line.startswith('import time:') or 'self [us]' in line:
+                continue
+            self_us, _, name = line[len('import time:'):].split('|')
+            imports.append((int(self_us), name.strip()))
+        imports.sort(reverse=True)
+        return [{'module': name, 'self_ms': self_us / 1000} for self_us, name in imports[:top]]
+
+    def handle(self, *args, **options):
+        if options['repeat'] < 1:
+            raise CommandError('--repeat must be at least 1.')
+        report = {}
+        for mode, run_warmup in (('cold', False), ('warmup', True)):
+            runs = [self._run_child(run_warmup, options['path'])[0] for _ in range(options['repeat'])]
+            report[mode] = {
+                key: min(run[key] for run in runs)
+                for key in ('import_ms', 'warmup_ms', 'first_request_ms', 'second_request_ms', 'process_ms')
+            }
+            report[mode]['status'] = runs[0]['status']
+        if options['top']:
+            _, stderr = self._run_child(False, options['path'], importtime=True)
+            report['slowest_imports'] = self._slowest_imports(stderr, options['top'])
+
+        if options['json']:
+            self.stdout.write(json.dumps(report, indent=2))
+            return
+        self.stdout.write(f'Best of {options["repeat"]} cold starts, first request: GET {options["path"]}')
+        self.stdout.write(f'{"mode":<8} {"process":>9} {"import":>9} {"warmup":>9} {"1st req":>9} {"2nd req":>9}  (ms)')
+        for mode in ('cold', 'warmup'):
+            row = report[mode]
+            self.stdout.write(
+                f'{mode:<8} {row["process_ms"]:>9.1f} {row["import_ms"]:>9.1f} {row["warmup_ms"]:>9.1f} '
+                f'{row["first_request_ms"]:>9.1f} {row["second_request_ms"]:>9.1f}'
+            )
+        if report.get('slowest_imports'):
+            self.stdout.write('\nSlowest imports (self time):')
+            for entry in report['slowest_imports']:
+                self.stdout.write(f'  {entry["self_ms"]:>8.1f} ms  {entry["module"]}')
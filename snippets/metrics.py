@@ -0,0 +1,167 @@
+"""
+Prometheus metrics for the SnipBox API.
+
+``MetricsMiddleware`` records per-request latency, status and DB query
+counts labelled by view class; ``metrics_view`` exposes them at ``/metrics``.
+
+When ``PROMETHEUS_MULTIPROC_DIR`` is set (as it is in the Docker image),
+each gunicorn worker writes its samples to memory-mapped files in that
+directory and the endpoint aggregates all of them, so a scrape of any one
+worker returns totals for the whole server.
+"""
+import os
+import time
+
+from django.db import connection
+from django.http import HttpResponse
+from prometheus_client import (
+    CONTENT_TYPE_LATEST,
+    REGISTRY,
+    CollectorRegistry,
+    Counter,
+    Gauge,
+    Histogram,
+    generate_latest,
+    multiprocess,
+)
+from prometheus_client.core import GaugeMetricFamily
+
+REQUEST_LATENCY = Histogram(
+    'snipbox_request_latency_seconds',
+    'API request latency in seconds.',
+    ['view', 'method', 'status'],
+    buckets=(0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0),
+)
+REQUEST_COUNT = Counter(
+    'snipbox_requests_total',
+    'API requests by view, method and response status.',
+    ['view', 'method', 'status'],
+)
+REQUEST_ERRORS = Counter(
+    'snipbox_request_errors_total',
+    'API requests that ended in a 5xx response.',
+    ['view', 'method', 'status'],
+)
+DB_QUERIES = Histogram(
+    'snipbox_db_queries_per_request',
+    'Number of database queries executed per request.',
+    ['view'],
+    buckets=(0, 1, 2, 3, 5, 8, 13, 21, 34, 55, 89),
+)
+IN_FLIGHT = Gauge(
+    'snipbox_requests_in_flight',
+    'Requests currently being handled.',
+    multiprocess_mode='livesum',
+)
+# The in-process backends track this gauge; the sqlite queue's depth is
+# counted from its file at scrape time (see ``TaskQueueDepthCollector``).
+TASK_QUEUE_DEPTH = Gauge(
+    'snipbox_task_queue_depth',
+    'Background tasks queued but not yet finished, by backend.',
+    ['backend'],
+    multiprocess_mode='livesum',
+)
+TASKS_PROCESSED = Counter(
+    'snipbox_tasks_processed_total',
+    'Background task runs by task name and result.',
+    ['task', 'result'],
+)
+
+UNMATCHED_VIEW = 'unmatched'
+
+
+class _QueryCounter:
+    """``connection.execute_wrapper`` hook that only counts executions."""
+
+    __slots__ = ('count',)
+
+    def __init__(self):
+        self.count = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        self.count += 1
+        return execute(sql, params, many, context)
+
+
+class MetricsMiddleware:
+    """Record latency, status and query count for every request."""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        request.metrics_view = UNMATCHED_VIEW
+        counter = _QueryCounter()
+        IN_FLIGHT.inc()
+        start = time.perf_counter()
+        try:
+            with connection.execute_wrapper(counter):
+                response = self.get_response(request)
+        finally:
+            IN_FLIGHT.dec()
+
+        view = request.metrics_view
+        if view is None:
+            return response
+        elapsed = time.perf_counter() - start
+        method = request.method
+        status = str(response.status_code)
+        REQUEST_LATENCY.labels(view, method, status).observe(elapsed)
+        REQUEST_COUNT.labels(view, method, status).inc()
+        if response.status_code >= 500:
+            REQUEST_ERRORS.labels(view, method, status).inc()
+        DB_QUERIES.labels(view).observe(counter.count)
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        if view_func is metrics_view:
+            # Don't let scrapes show up in the metrics they collect.
+            request.metrics_view = None
+            return None
+        view_class = getattr(view_func, 'view_class', None)
+        request.metrics_view = (
+            view_class.__name__ if view_class is not None
+            else getattr(view_func, '__name__', UNMATCHED_VIEW)
+        )
+        return None
+
+
+class TaskQueueDepthCollector:
+    """Collect ``registry`` plus the sqlite task queue's current depth.
+
+    The sqlite queue is a file shared by every process, so its depth is
+    read when scraped instead of being kept in a gauge that outlives the
+    worker that last set it.
+    """
+
+    def __init__(self, registry):
+        self.registry = registry
+
+    def collect(self):
+        from .tasks import SQLiteBackend, get_backend, get_config
+
+        depth = None
+        if get_config()['BACKEND'] == SQLiteBackend.name:
+            depth = get_backend().depth()
+        described = TASK_QUEUE_DEPTH.describe()[0]
+        name = described.name
+        for family in self.registry.collect():
+            if family.name == name and depth is not None:
+                family.add_sample(name, {'backend': SQLiteBackend.name}, depth)
+                depth = None
+            yield family
+        if depth is not None:
+            family = GaugeMetricFamily(name, described.documentation, labels=['backend'])
+            family.add_metric([SQLiteBackend.name], depth)
+            yield family
+
+
+def metrics_view(request):
+    """Expose all metrics in the Prometheus text format."""
+    if os.environ.get('PROMETHEUS_MULTIPROC_DIR'):
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+    else:
+        registry = REGISTRY
+    output = generate_latest(TaskQueueDepthCollector(registry))
+    return HttpResponse(output, content_type=CONTENT_TYPE_LATEST)
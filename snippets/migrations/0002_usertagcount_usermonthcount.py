@@ -0,0 +1,72 @@
+# Generated by Django 4.2.28 on 2026-10-18 23:26
+
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count, DateField
+from django.db.models.functions import TruncMonth
+import django.db.models.deletion
+
+
+def backfill_rollups(apps, schema_editor):
+    """Fill the new rollup tables from the snippets that already exist."""
+    Snippet = apps.get_model('snippets', 'Snippet')
+    UserTagCount = apps.get_model('snippets', 'UserTagCount')
+    UserMonthCount = apps.get_model('snippets', 'UserMonthCount')
+    UserTagCount.objects.bulk_create(
+        (
+            UserTagCount(user_id=row['snippet__user_id'], tag_id=row['tag_id'], count=row['count'])
+            for row in Snippet.tags.through.objects.values('snippet__user_id', 'tag_id').annotate(count=Count('id'))
+        ),
+        batch_size=1000,
+    )
+    UserMonthCount.objects.bulk_create(
+        (
+            UserMonthCount(user_id=row['user_id'], month=row['month'], count=row['count'])
+            for row in Snippet.objects.order_by()
+            .annotate(month=TruncMonth('created_at', output_field=DateField()))
+            .values('user_id', 'month')
+            .annotate(count=Count('id'))
+        ),
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('snippets', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='UserTagCount',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('count', models.IntegerField(default=0)),
+                ('tag', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='user_counts', to='snippets.tag')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='tag_counts', to=settings.AUTH_USER_MODEL)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='UserMonthCount',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('month', models.DateField()),
+                ('count', models.IntegerField(default=0)),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='month_counts', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'ordering': ['month'],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='usertagcount',
+            constraint=models.UniqueConstraint(fields=('user', 'tag'), name='unique_user_tag_count'),
+        ),
+        migrations.AddConstraint(
+            model_name='usermonthcount',
+            constraint=models.UniqueConstraint(fields=('user', 'month'), name='unique_user_month_count'),
+        ),
+        migrations.RunPython(backfill_rollups, migrations.RunPython.noop),
+    ]
@@ -37,3 +37,48 @@ class Snippet(models.Model):
 
     def __str__(self):
         return self.title
+
+
+class UserTagCount(models.Model):
+    """Rollup: how many of a user's snippets carry a tag."""
+
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='tag_counts',
+    )
+    tag = models.ForeignKey(
+        Tag,
+        on_delete=models.CASCADE,
+        related_name='user_counts',
+    )
+    count = models.IntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'tag'], name='unique_user_tag_count'),
+        ]
+
+    def __str__(self):
+        return f'{self.user_id}/{self.tag_id}: {self.count}'
+
+
+class UserMonthCount(models.Model):
+    """Rollup: how many snippets a user created in a month (first day)."""
+
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='month_counts',
+    )
+    month = models.DateField()
+    count = models.IntegerField(default=0)
+
+    class Meta:
+        ordering = ['month']
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'month'], name='unique_user_month_count'),
+        ]
+
+    def __str__(self):
+        return f'{self.user_id}/{self.month:%Y-%m}: {self.count}'
@@ -1,3 +1,4 @@
+from django.db import transaction
 from rest_framework import serializers
 from .models import Snippet, Tag
 
@@ -48,12 +49,17 @@ class SnippetWriteSerializer(serializers.ModelSerializer):
             tag_instances.append(tag)
         return tag_instances
 
+    # The snippet row, the tag lookups and the links commit together, so
+    # ``gc_tags`` never sees a looked-up tag before it is linked and a
+    # failure leaves no half-written snippet behind.
+    @transaction.atomic
     def create(self, validated_data):
         tags_data = validated_data.pop('tags', [])
         snippet = Snippet.objects.create(**validated_data)
         snippet.tags.set(self._handle_tags(tags_data))
         return snippet
 
+    @transaction.atomic
     def update(self, instance, validated_data):
         tags_data = validated_data.pop('tags', None)
         for attr, value in validated_data.items():
@@ -0,0 +1,86 @@
+"""
+Model signal receivers for ``Snippet`` and ``Tag`` writes.
+
+They keep the per-user stats rollups (``snippets.stats``) in step within
+the writing transaction, and turn each write into a task queue event
+(see ``snippets.tasks.dispatch``).
+
+Events and their keyword payloads:
+
+- ``snippet_saved``        — snippet_id, user_id, created
+- ``snippet_deleted``      — snippet_id, user_id
+- ``snippet_tags_changed`` — snippet_id, user_id, action, tag_ids
+- ``tag_saved``            — tag_id, created
+- ``tag_deleted``          — tag_id
+- ``tags_merged``          — source_id, target_id (sent by ``snippets.maintenance.merge_tags``)
+"""
+from django.db.models.signals import m2m_changed, post_delete, post_save, pre_delete
+from django.dispatch import receiver
+
+from . import stats
+from .models import Snippet, Tag
+from .tasks import dispatch
+
+
+@receiver(post_save, sender=Snippet)
+def snippet_saved(sender, instance, created, **kwargs):
+    if created:
+        stats.add_month(instance.user_id, instance.created_at, 1)
+    dispatch('snippet_saved', snippet_id=instance.pk, user_id=instance.user_id, created=created)
+
+
+@receiver(pre_delete, sender=Snippet)
+def snippet_deleting(sender, instance, **kwargs):
+    # Runs inside the delete's transaction. Writing first takes SQLite's
+    # write lock up front; a read-then-write transaction can fail with
+    # "database is locked" instead of waiting when another writer is busy.
+    stats.add_month(instance.user_id, instance.created_at, -1)
+    # Tag links are removed without an m2m_changed signal, so read them first.
+    stats.add_tags(instance.user_id, instance.tags.values_list('pk', flat=True), -1)
+
+
+@receiver(post_delete, sender=Snippet)
+def snippet_deleted(sender, instance, **kwargs):
+    dispatch('snippet_deleted', snippet_id=instance.pk, user_id=instance.user_id)
+
+
+@receiver(m2m_changed, sender=Snippet.tags.through)
+def snippet_tags_changed(sender, instance, action, reverse, pk_set, **kwargs):
+    if reverse:
+        tag_snippets_changed(instance, action, pk_set)
+        return
+    # Removals are counted before they happen so only existing links count.
+    if action == 'pre_remove':
+        stats.add_tags(instance.user_id, instance.tags.filter(pk__in=pk_set).values_list('pk', flat=True), -1)
+    elif action == 'pre_clear':
+        stats.add_tags(instance.user_id, instance.tags.values_list('pk', flat=True), -1)
+    elif action == 'post_add':
+        stats.add_tags(instance.user_id, pk_set, 1)
+    if action in ('post_add', 'post_remove', 'post_clear'):
+        dispatch(
+            'snippet_tags_changed',
+            snippet_id=instance.pk,
+            user_id=instance.user_id,
+            action=action,
+            tag_ids=sorted(pk_set or ()),
+        )
+
+
+def tag_snippets_changed(tag, action, pk_set):
+    """Rollup bookkeeping for ``tag.snippets.add/remove/clear``."""
+    if action == 'pre_remove':
+        stats.add_tag_to_snippets(tag.pk, tag.snippets.filter(pk__in=pk_set).values_list('pk', flat=True), -1)
+    elif action == 'pre_clear':
+        stats.add_tag_to_snippets(tag.pk, tag.snippets.values_list('pk', flat=True), -1)
+    elif action == 'post_add':
+        stats.add_tag_to_snippets(tag.pk, pk_set, 1)
+
+
+@receiver(post_save, sender=Tag)
+def tag_saved(sender, instance, created, **kwargs):
+    dispatch('tag_saved', tag_id=instance.pk, created=created)
+
+
+@receiver(post_delete, sender=Tag)
+def tag_deleted(sender, instance, **kwargs):
+    dispatch('tag_deleted', tag_id=instance.pk)
@@ -0,0 +1,123 @@
+"""
+Per-user snippet statistics kept in rollup tables.
+
+``UserTagCount`` and ``UserMonthCount`` are adjusted in place by the
+receivers in ``snippets.signals`` whenever snippets are created, deleted
+or re-tagged, so reading a user's stats never touches ``Snippet``.
+``rebuild`` recomputes them from scratch (``manage.py rebuild_stats``).
+"""
+from collections import Counter
+
+from django.db import transaction
+from django.db.models import Count, DateField, F
+from django.db.models.functions import TruncMonth
+from django.utils import timezone
+
+from .models import Snippet, UserMonthCount, UserTagCount
+
+SnippetTag = Snippet.tags.through
+
+
+def month_of(value):
+    """First day of the (current time zone) month ``value`` falls in."""
+    return timezone.localtime(value).date().replace(day=1)
+
+
+def _apply(model, key_field, user_id, deltas):
+    """Add ``deltas`` ({key: delta}) to ``user_id``'s rollup rows."""
+    for key, delta in deltas.items():
+        if not delta:
+            continue
+        rows = model.objects.filter(user_id=user_id, **{key_field: key})
+        if delta < 0:
+            rows.update(count=F('count') + delta)
+            rows.filter(count__lte=0).delete()
+        elif not rows.update(count=F('count') + delta):
+            _, created = model.objects.get_or_create(
+                user_id=user_id,
+                defaults={'count': delta},
+                **{key_field: key},
+            )
+            if not created:
+                rows.update(count=F('count') + delta)
+
+
+def add_month(user_id, created_at, delta):
+    _apply(UserMonthCount, 'month', user_id, {month_of(created_at): delta})
+
+
+def add_tags(user_id, tag_ids, delta):
+    _apply(UserTagCount, 'tag_id', user_id, {tag_id: delta for tag_id in tag_ids})
+
+
+def add_tag_to_snippets(tag_id, snippet_ids, delta):
+    """Adjust one tag's counts for the owners of ``snippet_ids``."""
+    owners = Counter(
+        Snippet.objects.filter(pk__in=snippet_ids).values_list('user_id', flat=True)
+    )
+    for user_id, count in owners.items():
+        _apply(UserTagCount, 'tag_id', user_id, {tag_id: count * delta})
+
+
+def rebuild_tag_counts(tag_ids):
+    """Recompute the ``UserTagCount`` rows of ``tag_ids`` for every user."""
+    with transaction.atomic():
+        UserTagCount.objects.filter(tag_id__in=tag_ids).delete()
+        UserTagCount.objects.bulk_create(
+            UserTagCount(user_id=row['snippet__user_id'], tag_id=row['tag_id'], count=row['count'])
+            for row in SnippetTag.objects.filter(tag_id__in=tag_ids)
+            .values('snippet__user_id', 'tag_id')
+            .annotate(count=Count('id'))
+        )
+
+
+def rebuild(user_ids=None, batch_size=1000):
+    """Recompute all rollups (or those of ``user_ids``) with grouped queries."""
+    links = SnippetTag.objects.all()
+    snippets = Snippet.objects.order_by()
+    tag_rows = UserTagCount.objects.all()
+    month_rows = UserMonthCount.objects.all()
+    if user_ids is not None:
+        links = links.filter(snippet__user_id__in=user_ids)
+        snippets = snippets.filter(user_id__in=user_ids)
+        tag_rows = tag_rows.filter(user_id__in=user_ids)
+        month_rows = month_rows.filter(user_id__in=user_ids)
+
+    with transaction.atomic():
+        tag_rows.delete()
+        month_rows.delete()
+        UserTagCount.objects.bulk_create(
+            (
+                UserTagCount(user_id=row['snippet__user_id'], tag_id=row['tag_id'], count=row['count'])
+                for row in links.values('snippet__user_id', 'tag_id').annotate(count=Count('id'))
+            ),
+            batch_size=batch_size,
+        )
+        UserMonthCount.objects.bulk_create(
+            (
+                UserMonthCount(user_id=row['user_id'], month=row['month'], count=row['count'])
+                for row in snippets.annotate(month=TruncMonth('created_at', output_field=DateField()))
+                .values('user_id', 'month')
+                .annotate(count=Count('id'))
+            ),
+            batch_size=batch_size,
+        )
+
+
+def stats_for(user):
+    """Return ``user``'s snippet totals per tag and per month."""
+    tags = [
+        {'id': row.tag_id, 'title': row.tag.title, 'count': row.count}
+        for row in UserTagCount.objects.filter(user=user, count__gt=0)
+        .select_related('tag')
+        .order_by('tag__title')
+    ]
+    months = [
+        {'month': f'{row.month:%Y-%m}', 'count': row.count}
+        for row in UserMonthCount.objects.filter(user=user, count__gt=0)
+    ]
+    return {
+        'total': sum(month['count'] for month in months),
+        'tags': tags,
+        'months': months,
+    }
@@ -0,0 +1,297 @@
+"""
+In-process background task queue for post-write work.
+
+Functions decorated with ``@task`` can be queued with ``enqueue`` (or
+``func.delay``); the call is handed to the configured backend once the
+current transaction commits, so the request that triggered it returns
+without waiting. Tasks may also subscribe to model events with
+``@task(on=[...])``; ``snippets.signals`` emits those events for
+``Snippet`` and ``Tag`` writes. The app itself registers no tasks yet;
+this module is the extension point for work that can leave the request.
+
+Backends, selected by ``SNIPBOX_TASKS['BACKEND']``:
+
+- ``thread``  — a thread pool owned by each gunicorn worker (default).
+- ``sqlite``  — rows in a durable SQLite queue drained by
+  ``manage.py run_worker``. Arguments must be JSON-serialisable. Each
+  row is leased to one worker before it runs, so several workers can
+  drain the same file.
+- ``eager``   — run inline; meant for tests.
+
+Failed tasks are retried up to ``MAX_RETRIES`` times with exponential
+backoff starting at ``RETRY_DELAY`` seconds.
+"""
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.db import connections, transaction
+
+from .metrics import TASK_QUEUE_DEPTH, TASKS_PROCESSED
+
+logger = logging.getLogger(__name__)
+
+DEFAULTS = {
+    'BACKEND': 'thread',
+    'WORKERS': 2,
+    'MAX_RETRIES': 3,
+    'RETRY_DELAY': 1.0,
+    'SQLITE_PATH': 'tasks.sqlite3',
+    # Seconds a claimed sqlite task stays hidden from other workers; a
+    # worker that dies mid-task releases it once the lease runs out.
+    'SQLITE_LEASE': 300,
+}
+
+_registry = {}
+_subscribers = {}
+
+
+def get_config():
+    """Return ``SNIPBOX_TASKS`` merged over the defaults."""
+    return {**DEFAULTS, **getattr(settings, 'SNIPBOX_TASKS', {})}
+
+
+def task(func=None, *, on=()):
+    """Register ``func`` as a task, optionally subscribed to model events."""
+    def decorator(fn):
+        name = f'{fn.__module__}.{fn.__name__}'
+        _registry[name] = fn
+        for event in on:
+            _subscribers.setdefault(event, []).append(name)
+        fn.task_name = name
+        fn.delay = lambda *args, **kwargs: enqueue(fn, *args, **kwargs)
+        return fn
+
+    if func is not None:
+        return decorator(func)
+    return decorator
+
+
+def enqueue(func, *args, **kwargs):
+    """Queue a registered task to run after the current transaction commits."""
+    name = func if isinstance(func, str) else func.task_name
+    if name not in _registry:
+        raise KeyError(f'Unknown task {name!r}.')
+    transaction.on_commit(lambda: get_backend().submit(name, args, kwargs))
+
+
+def dispatch(event, **payload):
+    """Queue every task subscribed to ``event`` with ``payload`` as kwargs."""
+    for name in _subscribers.get(event, ()):
+        enqueue(name, **payload)
+
+
+def run_task(name, args, kwargs):
+    """Run one task once, recording the outcome; re-raise on failure."""
+    try:
+        _registry[name](*args, **kwargs)
+    except Exception:
+        TASKS_PROCESSED.labels(name, 'failure').inc()
+        raise
+    TASKS_PROCESSED.labels(name, 'success').inc()
+
+
+def _run_with_retries(name, args, kwargs, config):
+    """Run a task, sleeping between attempts; used by in-process backends."""
+    attempts = config['MAX_RETRIES'] + 1
+    try:
+        for attempt in range(attempts):
+            try:
+                run_task(name, args, kwargs)
+                return
+            except Exception:
+                logger.exception('Task %s failed (attempt %d/%d).', name, attempt + 1, attempts)
+                if attempt + 1 < attempts:
+                    time.sleep(config['RETRY_DELAY'] * 2 ** attempt)
+    finally:
+        if threading.current_thread() is not threading.main_thread():
+            connections.close_all()
+
+
+class EagerBackend:
+    """Run tasks inline in the calling thread."""
+
+    name = 'eager'
+
+    def __init__(self, config):
+        self.config = config
+
+    def submit(self, name, args, kwargs):
+        _run_with_retries(name, args, kwargs, {**self.config, 'RETRY_DELAY': 0})
+
+
+class ThreadBackend:
+    """Run tasks on a thread pool owned by the current process."""
+
+    name = 'thread'
+
+    def __init__(self, config):
+        self.config = config
+        self._executor = None
+        self._lock = threading.Lock()
+
+    def _get_executor(self):
+        if self._executor is None:
+            with self._lock:
+                if self._executor is None:
+                    self._executor = ThreadPoolExecutor(
+                        max_workers=self.config['WORKERS'],
+                        thread_name_prefix='snipbox-task',
+                    )
+        return self._executor
+
+    def _run(self, name, args, kwargs):
+        try:
+            _run_with_retries(name, args, kwargs, self.config)
+        finally:
+            TASK_QUEUE_DEPTH.labels(self.name).dec()
+
+    def submit(self, name, args, kwargs):
+        TASK_QUEUE_DEPTH.labels(self.name).inc()
+        self._get_executor().submit(self._run, name, args, kwargs)
+
+    def reset(self):
+        """Forget the executor; its threads do not survive a fork."""
+        self._executor = None
+        self._lock = threading.Lock()
+
+
+class SQLiteBackend:
+    """Persist tasks in a SQLite file for ``manage.py run_worker`` to drain."""
+
+    name = 'sqlite'
+
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS task (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            name TEXT NOT NULL,
+            args TEXT NOT NULL,
+            kwargs TEXT NOT NULL,
+            attempts INTEGER NOT NULL DEFAULT 0,
+            run_after REAL NOT NULL,
+            failed INTEGER NOT NULL DEFAULT 0,
+            leased_until REAL NOT NULL DEFAULT 0
+        )
+    """
+
+    # One statement, so two workers can never claim the same row.
+    CLAIM = """
+        UPDATE task SET leased_until = :now + :lease
+        WHERE id = (
+            SELECT id FROM task
+            WHERE failed = 0 AND run_after <= :now AND leased_until <= :now
+            ORDER BY id LIMIT 1
+        )
+        RETURNING id, name, args, kwargs, attempts
+    """
+
+    def __init__(self, config):
+        self.config = config
+        path = os.fspath(config['SQLITE_PATH'])
+        if not os.path.isabs(path):
+            path = os.path.join(settings.BASE_DIR, path)
+        self.path = path
+
+    def _connect(self):
+        conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+        conn.execute('PRAGMA journal_mode=WAL')
+        conn.execute(self.SCHEMA)
+        columns = {row[1] for row in conn.execute('PRAGMA table_info(task)')}
+        if 'leased_until' not in columns:
+            # Queue files created before leases existed.
+            conn.execute('ALTER TABLE task ADD COLUMN leased_until REAL NOT NULL DEFAULT 0')
+        return conn
+
+    def submit(self, name, args, kwargs):
+        conn = self._connect()
+        try:
+            conn.execute(
+                'INSERT INTO task (name, args, kwargs, run_after) VALUES (?, ?, ?, ?)',
+                (name, json.dumps(list(args)), json.dumps(kwargs), time.time()),
+            )
+        finally:
+            conn.close()
+
+    def depth(self):
+        """Number of tasks still waiting to run."""
+        conn = self._connect()
+        try:
+            return conn.execute('SELECT COUNT(*) FROM task WHERE failed = 0').fetchone()[0]
+        finally:
+            conn.close()
+
+    def claim(self, conn):
+        """Lease the oldest due task to this worker; return its row or None."""
+        return conn.execute(self.CLAIM, {'now': time.time(), 'lease': self.config['SQLITE_LEASE']}).fetchone()
+
+    def drain(self, limit=100):
+        """Run up to ``limit`` due tasks; return how many were processed.
+
+        Tasks are claimed one at a time, so the lease only has to cover a
+        single task and other workers can take the rest meanwhile.
+        """
+        conn = self._connect()
+        try:
+            processed = 0
+            while processed < limit:
+                row = self.claim(conn)
+                if row is None:
+                    break
+                self._process(conn, *row)
+                processed += 1
+            return processed
+        finally:
+            conn.close()
+
+    def _process(self, conn, task_id, name, args, kwargs, attempts):
+        try:
+            if name not in _registry:
+                raise KeyError(f'Unknown task {name!r}.')
+            run_task(name, json.loads(args), json.loads(kwargs))
+        except Exception:
+            attempts += 1
+            logger.exception('Task %s (id %d) failed (attempt %d).', name, task_id, attempts)
+            if attempts > self.config['MAX_RETRIES']:
+                conn.execute('UPDATE task SET attempts = ?, failed = 1 WHERE id = ?', (attempts, task_id))
+            else:
+                delay = self.config['RETRY_DELAY'] * 2 ** (attempts - 1)
+                conn.execute(
+                    'UPDATE task SET attempts = ?, run_after = ?, leased_until = 0 WHERE id = ?',
+                    (attempts, time.time() + delay, task_id),
+                )
+        else:
+            conn.execute('DELETE FROM task WHERE id = ?', (task_id,))
+
+
+BACKENDS = {
+    EagerBackend.name: EagerBackend,
+    ThreadBackend.name: ThreadBackend,
+    SQLiteBackend.name: SQLiteBackend,
+}
+
+_backends = {}
+
+
+def get_backend(name=None):
+    """Return the backend instance for ``name`` (default: the configured one)."""
+    config = get_config()
+    name = name or config['BACKEND']
+    backend = _backends.get(name)
+    if backend is None or backend.config != config:
+        backend = _backends[name] = BACKENDS[name](config)
+    return backend
+
+
+def _after_fork_in_child():
+    thread_backend = _backends.get(ThreadBackend.name)
+    if thread_backend is not None:
+        thread_backend.reset()
+
+
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=_after_fork_in_child)
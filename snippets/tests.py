@@ -2,15 +2,37 @@
 Tests for the SnipBox snippets app.
 
 Covers JWT auth, snippet CRUD, ownership enforcement,
-tag deduplication, tag list, and tag detail endpoints.
+tag deduplication, tag list, and tag detail endpoints, plus batch
+fetch, stats rollups, tag maintenance, throttling, metrics, the task
+queue, and the loadtest/warmup helpers.
 """
+import asyncio
+import os
+import random
+import tempfile
+import threading
+
+from django.conf import settings
 from django.contrib.auth.models import User
-from django.urls import reverse
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.http import HttpResponse
+from django.test import RequestFactory, SimpleTestCase, override_settings
+from django.urls import get_resolver, reverse
+from prometheus_client import REGISTRY
 from rest_framework import status
 from rest_framework.test import APITestCase
 from rest_framework_simplejwt.tokens import RefreshToken
 
-from .models import Snippet, Tag
+from snipbox.warmup import warmup
+
+from .management.commands.loadtest import Session, op_delete, op_update, parse_mix, percentile
+from .maintenance import collect_orphan_tags, merge_tags, rename_tag
+from .models import Snippet, Tag, UserMonthCount, UserTagCount
+from .serializers import SnippetWriteSerializer
+from .stats import rebuild
+from .tasks import get_backend, task
+from .throttling import ConcurrencyLimitMiddleware, get_store
 
 
 def get_tokens_for_user(user):
@@ -188,6 +210,124 @@ class SnippetDetailUpdateDeleteTests(APITestCase):
         self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
 
 
+class SnippetBatchTests(APITestCase):
+    """Tests for the batch snippet fetch endpoint."""
+
+    def setUp(self):
+        self.user = User.objects.create_user(
+            username='heidi',
+            password='pass123',
+        )
+        self.other_user = User.objects.create_user(
+            username='ivan',
+            password='pass123',
+        )
+        self.token = get_tokens_for_user(self.user)
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {self.token}')
+        tag = Tag.objects.create(title='batch')
+        self.first = Snippet.objects.create(title='First', note='1', user=self.user)
+        self.second = Snippet.objects.create(title='Second', note='2', user=self.user)
+        self.second.tags.add(tag)
+        self.foreign = Snippet.objects.create(title='Foreign', note='3', user=self.other_user)
+
+    def test_batch_get_returns_owned_and_missing(self):
+        ids = f'{self.second.pk},{self.foreign.pk},{self.first.pk},9999'
+        # JWT user lookup, one id__in query, one tags prefetch.
+        with self.assertNumQueries(3):
+            response = self.client.get(f'/api/v1/snippets/batch/?ids={ids}')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            [snippet['id'] for snippet in response.data['snippets']],
+            [self.second.pk, self.first.pk],
+        )
+        self.assertEqual(response.data['snippets'][0]['tags'][0]['title'], 'batch')
+        self.assertEqual(response.data['missing'], [self.foreign.pk, 9999])
+
+    def test_batch_post_body(self):
+        response = self.client.post(
+            '/api/v1/snippets/batch/',
+            {'ids': [self.first.pk]},
+            format='json',
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['snippets'][0]['title'], 'First')
+        self.assertEqual(response.data['missing'], [])
+
+    def test_batch_invalid_ids(self):
+        response = self.client.get('/api/v1/snippets/batch/?ids=1,abc')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        response = self.client.get('/api/v1/snippets/batch/')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        response = self.client.get(f'/api/v1/snippets/batch/?ids={2 ** 63}')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        response = self.client.post('/api/v1/snippets/batch/', [1, 2], format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        response = self.client.post('/api/v1/snippets/batch/', {'ids': [1, -(2 ** 70)]}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+class SnippetStatsTests(APITestCase):
+    """Tests for the stats endpoint and its incremental rollups."""
+
+    def setUp(self):
+        self.user = User.objects.create_user(
+            username='kate',
+            password='pass123',
+        )
+        self.token = get_tokens_for_user(self.user)
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {self.token}')
+
+    def _create(self, title, tags):
+        snippet = Snippet.objects.create(title=title, note='Note', user=self.user)
+        snippet.tags.set([Tag.objects.get_or_create(title=tag)[0] for tag in tags])
+        return snippet.pk
+
+    def _tag_counts(self, data):
+        return {tag['title']: tag['count'] for tag in data['tags']}
+
+    def test_stats_follow_create_update_delete(self):
+        first = self._create('First', ['python', 'django'])
+        self._create('Second', ['python'])
+        self.client.patch(
+            f'/api/v1/snippets/{first}/',
+            {'tags': [{'title': 'orm'}]},
+            format='json',
+        )
+        response = self.client.get('/api/v1/snippets/stats/')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['total'], 2)
+        self.assertEqual(self._tag_counts(response.data), {'orm': 1, 'python': 1})
+        self.assertEqual(response.data['months'][0]['count'], 2)
+
+        self.client.delete(f'/api/v1/snippets/{first}/')
+        response = self.client.get('/api/v1/snippets/stats/')
+        self.assertEqual(response.data['total'], 1)
+        self.assertEqual(self._tag_counts(response.data), {'python': 1})
+
+    def test_stats_query_count_is_constant(self):
+        for index in range(5):
+            self._create(f'Snippet {index}', ['python', f'tag{index}'])
+        # JWT user lookup, tag rollup, month rollup.
+        with self.assertNumQueries(3):
+            self.client.get('/api/v1/snippets/stats/')
+
+    def test_rebuild_matches_incremental(self):
+        self._create('First', ['python', 'django'])
+        self._create('Second', ['python'])
+        expected = self.client.get('/api/v1/snippets/stats/').data
+        UserTagCount.objects.all().delete()
+        UserMonthCount.objects.all().delete()
+        rebuild()
+        self.assertEqual(self.client.get('/api/v1/snippets/stats/').data, expected)
+
+    def test_merge_keeps_stats_consistent(self):
+        self._create('First', ['py', 'python'])
+        self._create('Second', ['py'])
+        merge_tags(Tag.objects.get(title='py'), Tag.objects.get(title='python'))
+        response = self.client.get('/api/v1/snippets/stats/')
+        self.assertEqual(self._tag_counts(response.data), {'python': 2})
+
+
 class TagTests(APITestCase):
     """Tests for tag list and tag detail endpoints."""
 
@@ -226,3 +366,320 @@ class TagTests(APITestCase):
     def test_tag_not_found(self):
         response = self.client.get('/api/v1/tags/9999/')
         self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+
+class TagMaintenanceTests(APITestCase):
+    """Tests for orphaned tag collection and tag merging."""
+
+    def setUp(self):
+        self.user = User.objects.create_user(
+            username='judy',
+            password='pass123',
+        )
+        self.py = Tag.objects.create(title='py')
+        self.python = Tag.objects.create(title='python')
+        self.orphan = Tag.objects.create(title='orphan')
+        self.first = Snippet.objects.create(title='First', note='1', user=self.user)
+        self.second = Snippet.objects.create(title='Second', note='2', user=self.user)
+        self.first.tags.add(self.py, self.python)
+        self.second.tags.add(self.py)
+
+    def test_collect_orphan_tags(self):
+        Tag.objects.create(title='orphan2')
+        self.assertEqual(collect_orphan_tags(batch_size=1), 2)
+        self.assertEqual(
+            set(Tag.objects.values_list('title', flat=True)),
+            {'py', 'python'},
+        )
+
+    def test_collect_after_tag_removed(self):
+        self.first.tags.remove(self.python)
+        self.assertEqual(collect_orphan_tags(), 2)
+        self.assertFalse(Tag.objects.filter(title='python').exists())
+
+    def test_failed_tagging_rolls_back_the_snippet(self):
+        class FailingSerializer(SnippetWriteSerializer):
+            def _handle_tags(self, tags_data):
+                super()._handle_tags(tags_data)
+                raise RuntimeError('tag lookup failed')
+
+        serializer = FailingSerializer(data={'title': 'Third', 'note': '3', 'tags': [{'title': 'new'}]})
+        self.assertTrue(serializer.is_valid())
+        with self.assertRaises(RuntimeError):
+            serializer.save(user=self.user)
+        self.assertFalse(Snippet.objects.filter(title='Third').exists())
+        self.assertFalse(Tag.objects.filter(title='new').exists())
+
+    def test_merge_tags(self):
+        moved = merge_tags(self.py, self.python)
+        self.assertEqual(moved, 1)
+        self.assertFalse(Tag.objects.filter(pk=self.py.pk).exists())
+        self.assertEqual(list(self.first.tags.all()), [self.python])
+        self.assertEqual(list(self.second.tags.all()), [self.python])
+
+    def test_rename_tag_without_conflict(self):
+        tag = rename_tag(self.orphan, ' unused ')
+        self.assertEqual(tag.pk, self.orphan.pk)
+        self.assertEqual(Tag.objects.get(pk=tag.pk).title, 'unused')
+
+    def test_rename_tag_into_existing(self):
+        tag = rename_tag(self.py, 'python')
+        self.assertEqual(tag.pk, self.python.pk)
+        self.assertEqual(self.python.snippets.count(), 2)
+
+    def test_merge_tags_command_rejects_long_target(self):
+        with self.assertRaises(CommandError):
+            call_command('merge_tags', 'py', 'x' * 101)
+        self.assertEqual(Tag.objects.get(pk=self.py.pk).title, 'py')
+
+
+@override_settings(
+    REST_FRAMEWORK={
+        **settings.REST_FRAMEWORK,
+        'DEFAULT_THROTTLE_RATES': {'user': '100/min', 'snippets': '10/min'},
+    },
+)
+class ThrottleTests(APITestCase):
+    """Tests for token-bucket throttling and the concurrency limiter."""
+
+    def setUp(self):
+        get_store().clear()
+        self.user = User.objects.create_user(
+            username='leo',
+            password='pass123',
+        )
+        self.token = get_tokens_for_user(self.user)
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {self.token}')
+        self.snippet = Snippet.objects.create(title='Mine', note='Note', user=self.user)
+
+    def test_expensive_requests_drain_bucket_faster(self):
+        # The overview costs 5 tokens, so a 10-token bucket allows two.
+        for _ in range(2):
+            response = self.client.get('/api/v1/snippets/')
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+        response = self.client.get('/api/v1/snippets/')
+        self.assertEqual(response.status_code, status.HTTP_429_TOO_MANY_REQUESTS)
+        self.assertIn('Retry-After', response)
+
+    def test_cheap_requests_use_one_token(self):
+        for _ in range(10):
+            response = self.client.get(f'/api/v1/snippets/{self.snippet.pk}/')
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+        response = self.client.get(f'/api/v1/snippets/{self.snippet.pk}/')
+        self.assertEqual(response.status_code, status.HTTP_429_TOO_MANY_REQUESTS)
+
+    def test_buckets_are_per_user(self):
+        for _ in range(2):
+            self.client.get('/api/v1/snippets/')
+        other = User.objects.create_user(username='mia', password='pass123')
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {get_tokens_for_user(other)}')
+        response = self.client.get('/api/v1/snippets/')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    def test_bucket_store_is_atomic_across_connections(self):
+        store = get_store()
+        allowed = []
+
+        def take_many():
+            for _ in range(20):
+                allowed.append(store.take('race', 50, 1e-9, 1)[0])
+
+        threads = [threading.Thread(target=take_many) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(allowed.count(True), 50)
+
+    @override_settings(SNIPBOX_ADMISSION={'MAX_IN_FLIGHT': 1, 'RETRY_AFTER': 2})
+    def test_concurrency_limit_returns_503(self):
+        inner = []
+
+        def get_response(request):
+            # A second request arriving while this one is in flight.
+            inner.append(middleware(RequestFactory().get('/api/v1/snippets/')))
+            return HttpResponse()
+
+        middleware = ConcurrencyLimitMiddleware(get_response)
+        response = middleware(RequestFactory().get('/api/v1/snippets/'))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(inner[0].status_code, status.HTTP_503_SERVICE_UNAVAILABLE)
+        self.assertEqual(inner[0]['Retry-After'], '2')
+
+
+class MetricsTests(APITestCase):
+    """Tests for request metrics and the /metrics endpoint."""
+
+    def setUp(self):
+        self.user = User.objects.create_user(
+            username='frank',
+            password='pass123',
+        )
+        self.token = get_tokens_for_user(self.user)
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {self.token}')
+
+    def _sample(self, name, labels):
+        return REGISTRY.get_sample_value(name, labels) or 0
+
+    def test_request_counted_by_view_and_status(self):
+        labels = {'view': 'SnippetOverviewCreateView', 'method': 'GET', 'status': '200'}
+        before = self._sample('snipbox_requests_total', labels)
+        self.client.get('/api/v1/snippets/')
+        self.assertEqual(self._sample('snipbox_requests_total', labels), before + 1)
+
+    def test_db_queries_observed(self):
+        labels = {'view': 'TagListView'}
+        before = self._sample('snipbox_db_queries_per_request_count', labels)
+        self.client.get('/api/v1/tags/')
+        self.assertEqual(
+            self._sample('snipbox_db_queries_per_request_count', labels),
+            before + 1,
+        )
+
+    def test_metrics_endpoint_is_public(self):
+        self.client.credentials()
+        response = self.client.get('/metrics')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertIn(b'snipbox_requests_in_flight', response.content)
+
+
+task_calls = []
+
+
+@task
+def record_call(value):
+    task_calls.append(value)
+
+
+@task
+def flaky(value):
+    task_calls.append(value)
+    if len(task_calls) < 2:
+        raise RuntimeError('first attempt fails')
+
+
+@task(on=['snippet_saved'])
+def record_snippet_saved(snippet_id, user_id, created):
+    task_calls.append(('snippet_saved', snippet_id, created))
+
+
+@override_settings(SNIPBOX_TASKS={'BACKEND': 'eager', 'MAX_RETRIES': 2})
+class TaskQueueTests(APITestCase):
+    """Tests for the background task queue."""
+
+    def setUp(self):
+        task_calls.clear()
+        self.user = User.objects.create_user(
+            username='grace',
+            password='pass123',
+        )
+        self.token = get_tokens_for_user(self.user)
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {self.token}')
+
+    def test_task_runs_after_commit(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            record_call.delay('a')
+            self.assertEqual(task_calls, [])
+        self.assertEqual(task_calls, ['a'])
+
+    def test_failed_task_is_retried(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            flaky.delay('b')
+        self.assertEqual(task_calls, ['b', 'b'])
+
+    def test_snippet_create_dispatches_event(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post(
+                '/api/v1/snippets/',
+                {'title': 'Queued', 'note': 'Note'},
+                format='json',
+            )
+        self.assertIn(('snippet_saved', response.data['id'], True), task_calls)
+
+    def test_sqlite_backend_drains_queue(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            config = {'BACKEND': 'sqlite', 'SQLITE_PATH': os.path.join(tmp, 'tasks.sqlite3')}
+            with override_settings(SNIPBOX_TASKS=config):
+                with self.captureOnCommitCallbacks(execute=True):
+                    record_call.delay('c')
+                backend = get_backend()
+                self.assertEqual(backend.depth(), 1)
+                self.assertIn(
+                    b'snipbox_task_queue_depth{backend="sqlite"} 1.0',
+                    self.client.get('/metrics').content,
+                )
+                self.assertEqual(task_calls, [])
+                self.assertEqual(backend.drain(), 1)
+                self.assertEqual(backend.depth(), 0)
+        self.assertEqual(task_calls, ['c'])
+
+    def test_sqlite_task_is_claimed_once(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            config = {'BACKEND': 'sqlite', 'SQLITE_PATH': os.path.join(tmp, 'tasks.sqlite3')}
+            with override_settings(SNIPBOX_TASKS=config):
+                with self.captureOnCommitCallbacks(execute=True):
+                    record_call.delay('d')
+                backend = get_backend()
+                first, second = backend._connect(), backend._connect()
+                try:
+                    self.assertIsNotNone(backend.claim(first))
+                    # Leased to the first worker, so a second one skips it.
+                    self.assertIsNone(backend.claim(second))
+                    self.assertEqual(backend.drain(), 0)
+                finally:
+                    first.close()
+                    second.close()
+        self.assertEqual(task_calls, [])
+
+
+class LoadtestHelperTests(SimpleTestCase):
+    """Tests for the loadtest command's mix parsing, percentiles and operations."""
+
+    def test_parse_mix(self):
+        self.assertEqual(parse_mix('overview=3, tags=1'), {'overview': 3.0, 'tags': 1.0})
+        with self.assertRaises(CommandError):
+            parse_mix('export=1')
+        with self.assertRaises(CommandError):
+            parse_mix('overview=0')
+
+    def test_percentile(self):
+        values = list(range(1, 101))
+        self.assertEqual(percentile(values, 50), 50)
+        self.assertEqual(percentile(values, 99), 99)
+        self.assertEqual(percentile([], 99), 0.0)
+        self.assertEqual(percentile([1, 2, 3, 4, 5], 50), 3)
+        self.assertEqual(percentile([1, 2, 3, 4, 5], 90), 5)
+
+    def test_operations_only_touch_snippets_created_by_the_run(self):
+        class Client:
+            def __init__(self, statuses):
+                self.statuses = statuses
+                self.requests = []
+
+            async def request(self, method, path, token=None, payload=None):
+                self.requests.append((method, path))
+                status = self.statuses.pop(0)
+                return status, {'id': 7} if status == 201 else None
+
+        session = Session('token', 'loadtest-test-')
+        rng = random.Random(0)
+        # Nothing created yet: an update creates instead of editing old data,
+        # and is reported as the create it was.
+        client = Client([201, 429, 200])
+        self.assertEqual(asyncio.run(op_update(client, session, rng)), ('create', 201))
+        self.assertEqual(client.requests, [('POST', '/api/v1/snippets/')])
+        self.assertEqual(session.ids, [7])
+        # A throttled delete hands the id back so cleanup still removes it.
+        self.assertEqual(asyncio.run(op_delete(client, session, rng)), ('delete', 429))
+        self.assertEqual(session.ids, [7])
+        asyncio.run(op_delete(client, session, rng))
+        self.assertEqual(session.ids, [])
+
+
+class WarmupTests(SimpleTestCase):
+    """Tests for the production boot warmup."""
+
+    def test_warmup_builds_resolver_without_db_access(self):
+        # SimpleTestCase fails on any query, so this also checks warmup stays off the DB.
+        warmup()
+        self.assertTrue(get_resolver()._populated)
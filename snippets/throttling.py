@@ -0,0 +1,181 @@
+"""
+Admission control for the SnipBox API.
+
+- ``UserTokenBucketThrottle`` / ``EndpointTokenBucketThrottle`` are DRF
+  throttles backed by token buckets in a local SQLite file that all
+  gunicorn workers share. Each check is one atomic upsert, so concurrent
+  workers never lose updates. Rates come from ``DEFAULT_THROTTLE_RATES``
+  (``'<capacity>/<period>'``); a view may charge more than one token per
+  request with ``throttle_costs = {'GET': 5}``.
+- ``ConcurrencyLimitMiddleware`` answers 503 with ``Retry-After`` straight
+  away once a worker already has ``MAX_IN_FLIGHT`` requests running.
+"""
+import os
+import sqlite3
+import threading
+import time
+
+from django.conf import settings
+from django.http import JsonResponse
+from rest_framework.settings import api_settings
+from rest_framework.throttling import BaseThrottle
+
+PERIODS = {'s': 1, 'm': 60, 'h': 3600, 'd': 86400}
+
+
+def parse_rate(rate):
+    """Return ``(capacity, tokens refilled per second)`` for ``'N/period'``."""
+    num, period = rate.split('/')
+    capacity = int(num)
+    return capacity, capacity / PERIODS[period[0]]
+
+
+class BucketStore:
+    """Token buckets in a SQLite file shared by every worker process.
+
+    ``take`` refills and debits a bucket in a single ``INSERT ... ON
+    CONFLICT DO UPDATE ... RETURNING`` statement (SQLite 3.35+), which
+    SQLite serialises across processes. Connections are per thread and
+    reopened after a fork.
+    """
+
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS bucket (
+            key TEXT PRIMARY KEY,
+            tokens REAL NOT NULL,
+            updated REAL NOT NULL,
+            allowed INTEGER NOT NULL
+        )
+    """
+
+    TAKE = """
+        INSERT INTO bucket (key, tokens, updated, allowed) VALUES (:key, :capacity - :cost, :now, 1)
+        ON CONFLICT (key) DO UPDATE SET
+            tokens = CASE
+                WHEN min(:capacity, tokens + (:now - updated) * :refill) >= :cost
+                THEN min(:capacity, tokens + (:now - updated) * :refill) - :cost
+                ELSE min(:capacity, tokens + (:now - updated) * :refill)
+            END,
+            allowed = min(:capacity, tokens + (:now - updated) * :refill) >= :cost,
+            updated = :now
+        RETURNING tokens, allowed
+    """
+
+    # Buckets untouched for a day are full again and can be dropped.
+    PRUNE_EVERY = 10000
+    PRUNE_AGE = 86400
+
+    def __init__(self, path):
+        self.path = os.fspath(path)
+        self._local = threading.local()
+        self._calls = 0
+
+    def _connection(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None or self._local.pid != os.getpid():
+            conn = sqlite3.connect(self.path, timeout=5, isolation_level=None, check_same_thread=False)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            conn.execute(self.SCHEMA)
+            self._local.conn, self._local.pid = conn, os.getpid()
+        return conn
+
+    def take(self, key, capacity, refill, cost):
+        """Debit ``cost`` tokens; return ``(allowed, tokens left)``."""
+        conn = self._connection()
+        now = time.time()
+        tokens, allowed = conn.execute(self.TAKE, {
+            'key': key, 'capacity': capacity, 'refill': refill, 'cost': cost, 'now': now,
+        }).fetchone()
+        self._calls += 1
+        if self._calls % self.PRUNE_EVERY == 0:
+            conn.execute('DELETE FROM bucket WHERE updated < ?', (now - self.PRUNE_AGE,))
+        return bool(allowed), tokens
+
+    def clear(self):
+        self._connection().execute('DELETE FROM bucket')
+
+
+_stores = {}
+
+
+def get_store():
+    """Return the bucket store for ``SNIPBOX_THROTTLE['PATH']``."""
+    path = os.fspath(settings.SNIPBOX_THROTTLE['PATH'])
+    store = _stores.get(path)
+    if store is None:
+        store = _stores[path] = BucketStore(path)
+    return store
+
+
+class TokenBucketThrottle(BaseThrottle):
+    """Token bucket per (scope, client) kept in the shared ``BucketStore``."""
+
+    scope = None
+
+    def get_scope(self, view):
+        return self.scope
+
+    def get_ident_key(self, request):
+        if request.user and request.user.is_authenticated:
+            return f'user-{request.user.pk}'
+        return f'anon-{self.get_ident(request)}'
+
+    def get_cost(self, request, view):
+        return getattr(view, 'throttle_costs', {}).get(request.method, 1)
+
+    def allow_request(self, request, view):
+        scope = self.get_scope(view)
+        rate = api_settings.DEFAULT_THROTTLE_RATES.get(scope) if scope else None
+        if not rate:
+            return True
+        capacity, refill = parse_rate(rate)
+        cost = min(self.get_cost(request, view), capacity)
+        key = f'{scope}:{self.get_ident_key(request)}'
+
+        allowed, tokens = get_store().take(key, capacity, refill, cost)
+        if not allowed:
+            self.wait_seconds = (cost - tokens) / refill
+        return allowed
+
+    def wait(self):
+        return self.wait_seconds
+
+
+class UserTokenBucketThrottle(TokenBucketThrottle):
+    """Overall budget per user (or per IP for anonymous requests)."""
+
+    scope = 'user'
+
+
+class EndpointTokenBucketThrottle(TokenBucketThrottle):
+    """Per-user budget for views that set ``throttle_scope``."""
+
+    def get_scope(self, view):
+        return getattr(view, 'throttle_scope', None)
+
+
+class ConcurrencyLimitMiddleware:
+    """Shed load with a fast 503 when this worker is already saturated."""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        config = getattr(settings, 'SNIPBOX_ADMISSION', {})
+        self.retry_after = config.get('RETRY_AFTER', 1)
+        limit = config.get('MAX_IN_FLIGHT')
+        self.slots = threading.BoundedSemaphore(limit) if limit else None
+
+    def __call__(self, request):
+        if self.slots is None:
+            return self.get_response(request)
+        if not self.slots.acquire(blocking=False):
+            response = JsonResponse(
+                {'detail': 'Server is busy, please retry shortly.'},
+                status=503,
+            )
+            response['Retry-After'] = str(self.retry_after)
+            return response
+        try:
+            return self.get_response(request)
+        finally:
+            self.slots.release()
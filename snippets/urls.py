@@ -1,13 +1,17 @@
 from django.urls import path
 from .views import (
+    SnippetBatchView,
     SnippetDetailUpdateDeleteView,
     SnippetOverviewCreateView,
+    SnippetStatsView,
     TagDetailView,
     TagListView,
 )
 
 urlpatterns = [
     path('snippets/', SnippetOverviewCreateView.as_view(), name='snippet-list'),
+    path('snippets/batch/', SnippetBatchView.as_view(), name='snippet-batch'),
+    path('snippets/stats/', SnippetStatsView.as_view(), name='snippet-stats'),
     path('snippets/<int:pk>/', SnippetDetailUpdateDeleteView.as_view(), name='snippet-detail'),
     path('tags/', TagListView.as_view(), name='tag-list'),
     path('tags/<int:pk>/', TagDetailView.as_view(), name='tag-detail'),
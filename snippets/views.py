@@ -5,6 +5,7 @@ from rest_framework.permissions import IsAuthenticated
 from rest_framework.exceptions import ValidationError
 
 from .models import Snippet, Tag
+from .stats import stats_for
 from .serializers import (
     SnippetListSerializer,
     SnippetDetailSerializer,
@@ -20,6 +21,9 @@ class SnippetOverviewCreateView(APIView):
     """
 
     permission_classes = [IsAuthenticated]
+    throttle_scope = 'snippets'
+    # The overview serializes every snippet the user owns.
+    throttle_costs = {'GET': 5}
 
     def get(self, request):
         try:
@@ -92,6 +96,9 @@ class SnippetDetailUpdateDeleteView(APIView):
     """
 
     permission_classes = [IsAuthenticated]
+    throttle_scope = 'snippets'
+    # Delete responds with the full remaining list.
+    throttle_costs = {'DELETE': 5}
 
     def get_object(self, pk, user):
         """Return the snippet owned by this user or None."""
@@ -198,12 +205,103 @@ class SnippetDetailUpdateDeleteView(APIView):
             )
 
 
+class SnippetBatchView(APIView):
+    """
+    GET  /api/v1/snippets/batch/?ids=1,2,3  — Fetch several snippets at once.
+    POST /api/v1/snippets/batch/            — Same, with {"ids": [...]} for long lists.
+
+    Returns the owned snippets (in the requested order) and, separately,
+    the ids that do not exist or belong to another user.
+    """
+
+    permission_classes = [IsAuthenticated]
+    throttle_scope = 'snippets'
+    throttle_costs = {'GET': 5, 'POST': 5}
+    max_ids = 200
+    # Largest value a primary key column can hold (signed 64-bit).
+    max_pk = 2 ** 63 - 1
+
+    def _parse_ids(self, raw_ids):
+        """Return a de-duplicated list of ints, or raise ValidationError."""
+        if isinstance(raw_ids, str):
+            raw_ids = [part for part in raw_ids.split(',') if part.strip()]
+        if not isinstance(raw_ids, list) or not raw_ids:
+            raise ValidationError('Provide a non-empty list of snippet ids.')
+        try:
+            ids = list(dict.fromkeys(int(str(pk).strip()) for pk in raw_ids))
+        except ValueError:
+            raise ValidationError('Snippet ids must be integers.')
+        if not all(0 < pk <= self.max_pk for pk in ids):
+            raise ValidationError(f'Snippet ids must be between 1 and {self.max_pk}.')
+        if len(ids) > self.max_ids:
+            raise ValidationError(f'At most {self.max_ids} ids can be fetched at once.')
+        return ids
+
+    def _batch_response(self, request, raw_ids):
+        try:
+            ids = self._parse_ids(raw_ids)
+            snippets = {
+                snippet.pk: snippet
+                for snippet in Snippet.objects.filter(
+                    user=request.user,
+                    pk__in=ids,
+                ).order_by().prefetch_related('tags')
+            }
+            serializer = SnippetDetailSerializer(
+                [snippets[pk] for pk in ids if pk in snippets],
+                many=True,
+                context={'request': request},
+            )
+            return Response({
+                'snippets': serializer.data,
+                'missing': [pk for pk in ids if pk not in snippets],
+            }, status=status.HTTP_200_OK)
+        except ValidationError as exc:
+            return Response({'detail': exc.detail}, status=status.HTTP_400_BAD_REQUEST)
+        except Exception as exc:
+            return Response(
+                {'detail': 'An error occurred while fetching snippets.', 'error': str(exc)},
+                status=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            )
+
+    def get(self, request):
+        return self._batch_response(request, request.query_params.get('ids', ''))
+
+    def post(self, request):
+        if not isinstance(request.data, dict):
+            return Response(
+                {'detail': 'Request body must be an object with an "ids" list.'},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+        return self._batch_response(request, request.data.get('ids'))
+
+
+class SnippetStatsView(APIView):
+    """
+    GET /api/v1/snippets/stats/  — Snippet counts per tag and per month (current user).
+    """
+
+    permission_classes = [IsAuthenticated]
+    throttle_scope = 'snippets'
+
+    def get(self, request):
+        try:
+            return Response(stats_for(request.user), status=status.HTTP_200_OK)
+        except Exception as exc:
+            return Response(
+                {'detail': 'An error occurred while fetching snippet stats.', 'error': str(exc)},
+                status=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            )
+
+
 class TagListView(APIView):
     """
     GET /api/tags/  — List all available tags.
     """
 
     permission_classes = [IsAuthenticated]
+    throttle_scope = 'tags'
+    throttle_costs = {'GET': 5}
 
     def get(self, request):
         try:
@@ -223,6 +321,7 @@ class TagDetailView(APIView):
     """
 
     permission_classes = [IsAuthenticated]
+    throttle_scope = 'tags'
 
     def get(self, request, pk):
         try: